@@ -1,14 +1,171 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+_IMPORT_START = time.perf_counter()
+
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
+import asyncio
+import hashlib
+import heapq
+import math
 import pulp
+import subprocess
+import sys
+import threading
 import traceback
-import time
+import tracemalloc
+import types
 import json
 import os
 
-app = FastAPI()
+# Optional response encoders (pip install brotli msgpack)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+# Memory readings: psutil if installed, else resource (not on Windows)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+GAMEDATA_PATH = os.path.join("src", "data", "gameData.json")
+SOLVE_HISTORY_PATH = os.environ.get("SOLVE_HISTORY_PATH", "solve_history.jsonl")
+SOLVE_HISTORY_LIMIT = 500
+# Set SOLVE_CAPTURE_PATH to log every /solve payload for replay.py
+SOLVE_CAPTURE_PATH = os.environ.get("SOLVE_CAPTURE_PATH")
+SOLVE_CAPTURE_MAX_BYTES = int(os.environ.get("SOLVE_CAPTURE_MAX_BYTES", 50 * 1024 * 1024))
+SOLVE_CAPTURE_BACKUPS = 3
+# Per-solve memory ceiling; requests predicted above it are degraded to
+# relaxed ports or rejected (SOLVE_MEMORY_ACTION = "degrade" | "reject")
+SOLVE_MEMORY_LIMIT_MB = float(os.environ.get("SOLVE_MEMORY_LIMIT_MB", 0)) or None
+SOLVE_MEMORY_ACTION = os.environ.get("SOLVE_MEMORY_ACTION", "degrade")
+# Requests carrying a session id wait this long before solving; a newer
+# request from the same session within the window replaces them.
+SOLVE_DEBOUNCE_SECONDS = float(os.environ.get("SOLVE_DEBOUNCE_SECONDS", 0.3))
+SESSION_IDLE_SECONDS = 600
+
+# Populated by warm_up(); served by /health/ready
+STARTUP = {
+    "ready": False,
+    "importSeconds": IMPORT_SECONDS,
+    "gameDataSeconds": None,
+    "warmupSolveSeconds": None,
+    "totalSeconds": None,
+    "error": None,
+}
+
+# Parsed gameData.json plus id indexes, refreshed on load and save
+GAME_DATA = {"data": None, "items": {}, "machines": {}, "recipes": {}}
+_game_data_lock = threading.Lock()
+
+
+def index_game_data(data):
+    with _game_data_lock:
+        GAME_DATA["data"] = data
+        GAME_DATA["items"] = {i["id"]: i for i in data.get("items", [])}
+        GAME_DATA["machines"] = {m["id"]: m for m in data.get("machines", [])}
+        GAME_DATA["recipes"] = {r["id"]: r for r in data.get("recipes", [])}
+
+
+def load_game_data():
+    if not os.path.exists(GAMEDATA_PATH):
+        data = {"items": [], "machines": [], "recipes": []}
+    else:
+        with open(GAMEDATA_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    index_game_data(data)
+    return data
+
+
+def warm_up():
+    """Preload game data and run a tiny solve so the first /solve is not cold."""
+    start = time.perf_counter()
+    try:
+        t0 = time.perf_counter()
+        data = load_game_data()
+        STARTUP["gameDataSeconds"] = time.perf_counter() - t0
+        print(
+            f"[STARTUP] Game data indexed: {len(GAME_DATA['items'])} items, "
+            f"{len(GAME_DATA['recipes'])} recipes in {STARTUP['gameDataSeconds']:.3f}s"
+        )
+
+        t0 = time.perf_counter()
+        run_solver(warm_up_request(data))
+        STARTUP["warmupSolveSeconds"] = time.perf_counter() - t0
+        print(f"[STARTUP] Warm-up solve finished in {STARTUP['warmupSolveSeconds']:.2f}s")
+    except Exception as e:
+        STARTUP["error"] = str(e)
+        print(f"[STARTUP] Warm-up failed: {e}")
+        traceback.print_exc()
+    STARTUP["totalSeconds"] = time.perf_counter() - start
+    STARTUP["ready"] = True
+
+
+def warm_up_request(data):
+    # One small zone over the real recipe set, so the same code paths are hit.
+    # Falls back to a single dummy recipe when no game data is saved yet.
+    warm_up_input = CalculatorInput(
+        targets=[],
+        resourceConstraints=[],
+        zones=[WARM_UP_ZONE],
+        optimizationMode="maxIncome",
+        timeLimit=5,
+    )
+    if data.get("recipes"):
+        return SolveRequest(
+            input=warm_up_input,
+            items=data["items"],
+            recipes=data["recipes"],
+            machines=data["machines"],
+        )
+    return SolveRequest(
+        input=warm_up_input,
+        items=[
+            Item(id="ore", name="ore", price=0, isRawResource=True, baseProductionRate=30),
+            Item(id="ingot", name="ingot", price=1, isRawResource=False),
+        ],
+        recipes=[
+            Recipe(
+                id="smelt",
+                machineId="furnace",
+                name="ore -> ingot",
+                outputItemId="ingot",
+                outputAmount=1,
+                craftingTime=2,
+                inputs=[RecipeInput(itemId="ore", amount=1)],
+            )
+        ],
+        machines=[Machine(id="furnace", name="furnace", area=9)],
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"[STARTUP] Imports loaded in {IMPORT_SECONDS:.3f}s")
+    # Run in the background so the server accepts connections immediately;
+    # /health/ready reports 503 until this completes, and after if it failed.
+    threading.Thread(target=warm_up, name="solver-warmup", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,8 +174,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compresses any response when the client accepts gzip; /solve may already
+# have applied br, in which case this leaves the body alone.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-GAMEDATA_PATH = os.path.join("src", "data", "gameData.json")
+
+@app.get("/health/ready")
+async def health_ready():
+    # 503 while warming up ("ready" false) and after a failed warm-up ("error")
+    if not STARTUP["ready"] or STARTUP["error"]:
+        return JSONResponse(status_code=503, content=STARTUP)
+    return STARTUP
 
 
 # Data Models
@@ -63,10 +229,9 @@ class GameData(BaseModel):
 @app.get("/game-data")
 async def get_game_data():
     try:
-        if not os.path.exists(GAMEDATA_PATH):
-            return {"items": [], "machines": [], "recipes": []}
-        with open(GAMEDATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        if GAME_DATA["data"] is not None:
+            return GAME_DATA["data"]
+        return load_game_data()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -77,6 +242,7 @@ async def save_game_data(data: GameData):
         os.makedirs(os.path.dirname(GAMEDATA_PATH), exist_ok=True)
         with open(GAMEDATA_PATH, "w", encoding="utf-8") as f:
             json.dump(data.dict(), f, indent=2, ensure_ascii=False)
+        index_game_data(data.dict())
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -93,6 +259,11 @@ class Zone(BaseModel):
     areaLimit: Optional[float] = None
 
 
+WARM_UP_ZONE = Zone(
+    id="warmup", name="warmup", outputPorts=2, inputPorts=2, portThroughput=30
+)
+
+
 class ProductionTarget(BaseModel):
     itemId: str
     targetRate: float
@@ -124,6 +295,30 @@ class CalculatorInput(BaseModel):
     consolidationWeight: Optional[float] = 0.05
     machineWeight: Optional[float] = 0.01
     timeLimit: Optional[float] = 30
+    # Best plan plus up to solutionCount - 1 alternatives, all within timeLimit
+    solutionCount: Optional[int] = 1
+    # "exact": integer ports per zone x item in the MILP.
+    # "relaxed": continuous ports, then integer allocation + repair afterwards.
+    portMode: Optional[str] = "exact"
+    portRepairTolerance: Optional[float] = 0.05
+    compareExact: Optional[bool] = False
+    # "auto" picks timeLimit, gap, threads and portMode from model size and
+    # past solve times (see choose_strategy); anything else uses the fields above.
+    strategy: Optional[str] = None
+    # Overrides SOLVE_MEMORY_LIMIT_MB for this request
+    memoryLimitMB: Optional[float] = None
+    # Track Python allocations per phase with tracemalloc (slows the build).
+    # Traced solves run one at a time; untraced ones running alongside still
+    # count towards the traced peaks.
+    traceMemory: Optional[bool] = False
+    # "weighted": one objective with a 1e6 shortfall penalty (default).
+    # "lexicographic": shortfall, then (minTransfers) transfers, then profit,
+    # then optionally the machine/recipe/port tie-breaks, one solve each.
+    objectiveMode: Optional[str] = "weighted"
+    tieBreak: Optional[bool] = True
+    # Relative slack (on top of LEX_ABS_TOLERANCE) when fixing a stage's
+    # optimum for the next stage
+    lexTolerance: Optional[float] = 1e-6
 
 
 class SolveRequest(BaseModel):
@@ -131,28 +326,831 @@ class SolveRequest(BaseModel):
     items: List[Item]
     recipes: List[Recipe]
     machines: List[Machine]
+    # Client session (or X-Solve-Session header); newer requests supersede older
+    sessionId: Optional[str] = None
+
+
+class SolveCancelled(Exception):
+    pass
+
+
+# session id -> latest generation, its cancel event, generations still in
+# flight and the count of requests dropped since the last delivered result
+SESSIONS: Dict[str, Dict[str, Any]] = {}
+SESSION_STATS = {"received": 0, "solved": 0, "coalesced": 0, "cancelled": 0}
+_session_lock = threading.Lock()
+
+
+def register_session_request(session_id):
+    """Make this the session's latest request and cancel the previous one."""
+    now = time.time()
+    with _session_lock:
+        for s_id in [
+            s_id
+            for s_id, s in SESSIONS.items()
+            if now - s["lastSeen"] > SESSION_IDLE_SECONDS
+        ]:
+            del SESSIONS[s_id]
+        session = SESSIONS.setdefault(
+            session_id,
+            {"generation": 0, "cancel": None, "dropped": 0, "pending": set()},
+        )
+        if session["cancel"] is not None:
+            session["cancel"].set()
+        # Counted here rather than when the older request gets around to
+        # stopping, so the result that replaces it reports it
+        if session["generation"] in session["pending"]:
+            session["dropped"] += 1
+        session["generation"] += 1
+        session["pending"].add(session["generation"])
+        session["cancel"] = threading.Event()
+        session["lastSeen"] = now
+        return session["generation"], session["cancel"]
+
+
+def is_superseded(session_id, generation):
+    with _session_lock:
+        session = SESSIONS.get(session_id)
+        return session is not None and session["generation"] != generation
+
+
+def drop_session_request(session_id, generation, stat):
+    with _session_lock:
+        SESSION_STATS[stat] += 1
+        if session_id in SESSIONS:
+            SESSIONS[session_id]["pending"].discard(generation)
+
+
+def superseded_response(session_id, stage):
+    """
+    409 for a dropped request. `stage` is "coalesced" when it never reached
+    the solver, "cancelled" when its running solver process was killed.
+    Model building is not interruptible, so a cancelled request may still
+    have spent up to its build time after being superseded.
+    """
+    return JSONResponse(
+        status_code=409,
+        content={
+            "detail": "Superseded by a newer request in the same session",
+            "sessionId": session_id,
+            "stage": stage,
+        },
+    )
+
+
+def check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise SolveCancelled()
+
+
+@app.get("/solve/stats")
+async def solve_stats():
+    now = time.time()
+    with _session_lock:
+        active = sum(1 for s in SESSIONS.values() if now - s["lastSeen"] < 300)
+        return {**SESSION_STATS, "activeSessions": active}
 
 
 @app.post("/solve")
-async def solve(request: SolveRequest):
-    start_time = time.time()
+async def solve(request: SolveRequest, http_request: Request):
     print(
         f"\n[SOLVER] Received request: {len(request.input.targets)} targets, {len(request.input.zones)} zones."
     )
+    media_type = negotiate_media_type(http_request.headers.get("accept", ""))
+    session_id = request.sessionId or http_request.headers.get("x-solve-session")
+    generation, cancel = None, None
+    with _session_lock:
+        SESSION_STATS["received"] += 1
+    if session_id:
+        generation, cancel = register_session_request(session_id)
+        await asyncio.sleep(SOLVE_DEBOUNCE_SECONDS)
+        if is_superseded(session_id, generation):
+            print(f"[SOLVER] Session {session_id}: coalesced into a newer request.")
+            drop_session_request(session_id, generation, "coalesced")
+            return superseded_response(session_id, "coalesced")
+    # Timed from here so logs and captures leave out the debounce wait
+    start_time = time.time()
     try:
-        result = run_solver(request)
+        result = await run_in_threadpool(run_solver, request, None, cancel)
         duration = time.time() - start_time
         status = "Optimal" if result.get("solverFeasible") else "Infeasible/Error"
         print(f"[SOLVER] Processed in {duration:.2f}s. Status: {status}")
-        return result
+        if session_id and cancel.is_set():
+            # Superseded after its last solver call finished
+            raise SolveCancelled()
+        with _session_lock:
+            SESSION_STATS["solved"] += 1
+            if session_id and session_id in SESSIONS:
+                # Requests of this session dropped since its last delivered solve
+                session = SESSIONS[session_id]
+                result["session"] = {"id": session_id, "coalesced": session["dropped"]}
+                session["dropped"] = 0
+        if SOLVE_CAPTURE_PATH:
+            capture_solve(request, result, duration)
+        if media_type == "application/json":
+            return result
+        return encode_response(
+            result,
+            media_type,
+            [z.id for z in request.input.zones],
+            http_request.headers.get("accept-encoding", ""),
+        )
+    except SolveCancelled:
+        print(f"[SOLVER] Session {session_id}: cancelled by a newer request.")
+        drop_session_request(session_id, generation, "cancelled")
+        return superseded_response(session_id, "cancelled")
     except Exception as e:
         print(f"[SOLVER] CRITICAL ERROR: {str(e)}")
         traceback.print_exc()
+        if SOLVE_CAPTURE_PATH:
+            capture_solve(request, {"error": str(e)}, time.time() - start_time)
+        if isinstance(e, MemoryBudgetExceeded):
+            raise HTTPException(status_code=413, detail=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Delivered, cancelled or failed: no longer counts as dropped when the
+        # next request of the session arrives
+        if session_id:
+            with _session_lock:
+                if session_id in SESSIONS:
+                    SESSIONS[session_id]["pending"].discard(generation)
+
+
+def model_fingerprint(request: SolveRequest):
+    """
+    Hash of everything that shapes the model. Solver and diagnostics
+    settings (time limit, strategy, memory limit and tracing) are left out
+    so the same scenario keeps its fingerprint.
+    """
+    payload = request.dict()
+    payload.pop("sessionId", None)
+    for key in (
+        "timeLimit",
+        "strategy",
+        "solutionCount",
+        "compareExact",
+        "memoryLimitMB",
+        "traceMemory",
+    ):
+        payload["input"].pop(key, None)
+    canonical = json.dumps(_as_floats(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def _as_floats(value):
+    # 2 and 2.0 must hash alike: clients send either, replays always see floats
+    if isinstance(value, dict):
+        return {k: _as_floats(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_as_floats(v) for v in value]
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def rotate_capture_log(path):
+    if not os.path.exists(path) or os.path.getsize(path) < SOLVE_CAPTURE_MAX_BYTES:
+        return
+    for k in range(SOLVE_CAPTURE_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{k}"):
+            os.replace(f"{path}.{k}", f"{path}.{k + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def capture_solve(request: SolveRequest, result, duration):
+    record = {
+        "capturedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fingerprint": model_fingerprint(request),
+        "size": model_size(request),
+        "durationSeconds": duration,
+        "status": (
+            "Error"
+            if "error" in result
+            else "Optimal"
+            if result.get("solverFeasible")
+            else "Infeasible"
+        ),
+        "objective": result.get("objective"),
+        "totalIncome": result.get("totalIncome"),
+        "error": result.get("error"),
+        # Settings an auto strategy picked, so replays can pin them
+        "strategy": (
+            {
+                key: result["strategy"][key]
+                for key in ("tier", "portMode", "timeLimit", "solverOptions")
+            }
+            if "strategy" in result
+            else None
+        ),
+        "request": request.dict(),
+    }
+    try:
+        rotate_capture_log(SOLVE_CAPTURE_PATH)
+        with open(SOLVE_CAPTURE_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[SOLVER] Could not capture request: {e}")
+
+
+# Result encodings for /solve, chosen from the Accept header.
+# application/json (default) keeps the full result shape.
+COMPACT_JSON = "application/vnd.endfield.compact+json"
+COMPACT_MSGPACK = "application/vnd.endfield.compact+msgpack"
+MSGPACK = "application/msgpack"
+COMPACT_EPSILON = 1e-3
+
+
+def ranked_header_values(header):
+    """
+    (value, q) pairs of an Accept-style header, best first: ranked by q
+    (default 1, ties keep the client's order). q=0 entries are refusals and
+    come last.
+    """
+    ranked = []
+    for position, part in enumerate(header.split(",")):
+        fields = part.split(";")
+        value = fields[0].strip().lower()
+        q = 1.0
+        for param in fields[1:]:
+            key, _, q_value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(q_value)
+                except ValueError:
+                    q = 0.0
+        if value:
+            ranked.append((-q, position, value))
+    return [(value, -neg_q) for neg_q, _, value in sorted(ranked)]
+
+
+def negotiate_media_type(accept):
+    """
+    Pick the /solve encoding from an Accept header (see ranked_header_values;
+    q=0 entries are refused). application/json, application/* and */* select the default JSON shape.
+    """
+    if not accept.strip():
+        return "application/json"
+
+    missing_msgpack = False
+    for media_type, q in ranked_header_values(accept):
+        if q <= 0:
+            continue
+        if media_type == "application/x-msgpack":
+            media_type = MSGPACK
+        if media_type in ("*/*", "application/*"):
+            media_type = "application/json"
+        if media_type not in ("application/json", COMPACT_JSON, COMPACT_MSGPACK, MSGPACK):
+            continue
+        if media_type in (COMPACT_MSGPACK, MSGPACK) and msgpack is None:
+            missing_msgpack = True
+            continue
+        return media_type
+    if missing_msgpack:
+        raise HTTPException(
+            status_code=406, detail="MessagePack encoding needs `pip install msgpack`"
+        )
+    return "application/json"
+
+
+def encode_response(result, media_type, zone_ids, accept_encoding):
+    if media_type in (COMPACT_JSON, COMPACT_MSGPACK):
+        result = compact_result(result, zone_ids)
+    if media_type == COMPACT_JSON:
+        body = json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode()
+    else:
+        body = msgpack.packb(result, use_bin_type=True)
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    # gzip is handled by GZipMiddleware; br is only available here
+    if brotli is not None and prefers_brotli(accept_encoding):
+        body = brotli.compress(body)
+        headers["Content-Encoding"] = "br"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def prefers_brotli(accept_encoding):
+    """
+    True if Accept-Encoding allows br (or *) with a q at least that of gzip
+    and identity. Equal q is the server's pick (browsers list gzip first).
+    """
+    q = {}
+    for coding, weight in ranked_header_values(accept_encoding):
+        q.setdefault(coding, weight)
+    br = q["br"] if "br" in q else q.get("*", 0)
+    return br > 0 and br >= max(q.get("gzip", 0), q.get("identity", 0))
+
+
+def _round(v):
+    return float(f"{v:.6g}")
+
+
+def compact_result(result, zone_ids):
+    """
+    Columnar layout: item, recipe and zone ids are interned into index tables,
+    each list of records becomes a dict of parallel columns, zone objects are
+    not echoed back and entries below COMPACT_EPSILON are dropped.
+    """
+    item_ids, recipe_ids = [], []
+    item_index, recipe_index = {}, {}
+    zone_index = {z_id: k for k, z_id in enumerate(zone_ids)}
+
+    def item(i_id):
+        if i_id not in item_index:
+            item_index[i_id] = len(item_ids)
+            item_ids.append(i_id)
+        return item_index[i_id]
+
+    def recipe(r_id):
+        if r_id not in recipe_index:
+            recipe_index[r_id] = len(recipe_ids)
+            recipe_ids.append(r_id)
+        return recipe_index[r_id]
+
+    def columns(rows, spec):
+        cols = {name: [] for name in spec}
+        for row in rows:
+            for name, (key, encode) in spec.items():
+                cols[name].append(encode(row[key]))
+        return cols
+
+    zones = {
+        "zone": [],
+        "outputPortsUsed": [],
+        "inputPortsUsed": [],
+        "totalMachines": [],
+        "totalElectricity": [],
+        "areaUsed": [],
+    }
+    assignments = {
+        "zone": [],
+        "recipe": [],
+        "machineCount": [],
+        "utilization": [],
+        "requiredRate": [],
+        "actualRate": [],
+    }
+    # kind: 0 = itemsFromPool, 1 = itemsToPool, 2 = itemsSold
+    zone_items = {"zone": [], "item": [], "kind": [], "rate": []}
+    for zr in result.get("zoneResults", []):
+        z = zone_index[zr["zone"]["id"]]
+        zones["zone"].append(z)
+        for key in zones:
+            if key != "zone":
+                zones[key].append(_round(zr.get(key) or 0))
+        for a in zr["assignments"]:
+            assignments["zone"].append(z)
+            assignments["recipe"].append(recipe(a["recipeId"]))
+            assignments["machineCount"].append(a["machineCount"])
+            for key in ("utilization", "requiredRate", "actualRate"):
+                assignments[key].append(_round(a[key]))
+        for kind, key in enumerate(("itemsFromPool", "itemsToPool", "itemsSold")):
+            for entry in zr[key]:
+                if entry["rate"] < COMPACT_EPSILON:
+                    continue
+                zone_items["zone"].append(z)
+                zone_items["item"].append(item(entry["itemId"]))
+                zone_items["kind"].append(kind)
+                zone_items["rate"].append(_round(entry["rate"]))
+
+    flows = [f for f in result.get("itemFlows", []) if f["rate"] >= COMPACT_EPSILON]
+    compact = {
+        "format": "compact-v1",
+        "feasible": result["feasible"],
+        "solverFeasible": result["solverFeasible"],
+        "totalIncome": result.get("totalIncome", 0),
+        "totalElectricity": result.get("totalElectricity", 0),
+        "totalOutputPortsUsed": result.get("totalOutputPortsUsed", 0),
+        "transferOverhead": result.get("transferOverhead", 0),
+        "warnings": result.get("warnings", []),
+        "zones": zones,
+        "assignments": assignments,
+        "zoneItems": zone_items,
+        # fromZone = -1 for raw resources drawn from the global pool
+        "itemFlows": columns(
+            flows,
+            {
+                "item": ("itemId", item),
+                "fromZone": ("fromZoneId", lambda z_id: zone_index.get(z_id, -1)),
+                "toZone": ("toZoneId", zone_index.get),
+                "rate": ("rate", _round),
+            },
+        ),
+        "globalResourceUsage": columns(
+            result.get("globalResourceUsage", []),
+            {"item": ("itemId", item), "rate": ("rate", _round)},
+        ),
+        "unmetTargets": columns(
+            result.get("unmetTargets", []),
+            {"item": ("itemId", item), "shortfall": ("shortfall", _round)},
+        ),
+    }
+    for key, value in result.items():
+        if key not in compact and key not in (
+            "zoneResults",
+            "itemFlows",
+            "globalResourceUsage",
+            "unmetTargets",
+            "alternatives",
+        ):
+            compact[key] = value
+    if "alternatives" in result:
+        compact["alternatives"] = [
+            compact_result(alt, zone_ids) for alt in result["alternatives"]
+        ]
+    compact["ids"] = {"zones": zone_ids, "items": item_ids, "recipes": recipe_ids}
+    return compact
+
+
+_trace_lock = threading.Lock()
+
+
+def run_solver(
+    request: SolveRequest, solver_options=None, cancel=None, record_history=True
+):
+    """
+    `solver_options` are passed to every solve_model() call on top of any the
+    auto strategy picks, e.g. {"randomSeed": 0, "threads": 1} for replays.
+    `record_history=False` keeps auto-strategy timings out of the solve
+    history (replays must not shift production predictions).
+    `cancel` is a threading.Event; once set, a running solver process is
+    killed and the solve stops with SolveCancelled. Model building and
+    result extraction are not interrupted, only checked between phases.
+    """
+    check_cancelled(cancel)
+    print("[SOLVER] Initializing MILP model...")
+    strategy = None
+    if request.input.strategy == "auto":
+        strategy = choose_strategy(request)
+        request = with_input(
+            request, timeLimit=strategy["timeLimit"], portMode=strategy["portMode"]
+        )
+    request, memory = check_memory_budget(request)
+    if strategy and request.input.portMode != strategy["portMode"]:
+        # Degraded to relaxed ports: history must record what actually ran
+        strategy["portMode"] = request.input.portMode
+        strategy["predictedSeconds"], strategy["historySamples"] = (
+            predict_solve_seconds(
+                strategy["features"]["nonzeros"],
+                strategy["portMode"],
+                load_solve_history(),
+            )
+        )
+
+    # tracemalloc is process-wide: traced solves run one at a time so they do
+    # not reset each other's peaks or stop tracing under one another
+    with _trace_lock if memory["tracePython"] else nullcontext():
+        started_trace = memory["tracePython"] and not tracemalloc.is_tracing()
+        if started_trace:
+            tracemalloc.start()
+        _solve_context.cancel, _solve_context.memory = cancel, memory
+        try:
+            result = _run_phases(
+                request, solver_options, strategy, memory, cancel, record_history
+            )
+        finally:
+            _solve_context.cancel = _solve_context.memory = None
+            if started_trace:
+                tracemalloc.stop()
+    # Largest of the end-of-phase readings, not a sampled peak
+    memory["maxPhaseEndRssMB"] = max(
+        (p["rssMB"] for p in memory["phases"].values() if p["rssMB"] is not None),
+        default=None,
+    )
+    memory["processPeakRssMB"] = peak_rss_mb()
+    if "warning" in memory:
+        result.setdefault("warnings", []).append(memory["warning"])
+    result["diagnostics"] = {"memory": memory}
+    return result
+
+
+def _run_phases(request, solver_options, strategy, memory, cancel, record_history):
+    with memory_phase(memory, "build"):
+        built = build_model(request)
+    check_cancelled(cancel)
+    built["cancel"] = cancel
+    built["memory_degraded"] = memory["action"] == "degraded"
+    built["solver_options"] = {
+        **(strategy["solverOptions"] if strategy else {}),
+        **(solver_options or {}),
+    }
+    time_limit = request.input.timeLimit or 15
+
+    with memory_phase(memory, "solve"):
+        solve_start = time.time()
+        # The best plan, its port repair or exact comparison and any
+        # alternatives share one timeLimit
+        built["deadline"] = solve_start + time_limit
+        error = solve_current(built, time_limit)
+        # Re-solves for repair and alternatives overwrite built["lexicographic"]
+        lexicographic = built.get("lexicographic")
+        built["solve_seconds"] = time.time() - solve_start
+        if error:
+            return {
+                "feasible": False,
+                "solverFeasible": False,
+                "warnings": [error],
+            }
 
+        check_cancelled(cancel)
+        port_info = None
+        if built["relaxed_ports"]:
+            port_info = repair_ports(built)
+            check_cancelled(cancel)
+        if strategy:
+            # The whole phase, so relaxed-mode history includes port repair
+            # and any exact fallback
+            strategy["actualSeconds"] = time.time() - solve_start
+            strategy["firstSolveSeconds"] = built["solve_seconds"]
+            if record_history:
+                record_solve_history(strategy, pulp.LpStatus[built["model"].status])
+
+    with memory_phase(memory, "extract"):
+        result = extract_result(built)
+        best_pattern = active_recipe_pattern(built)
+    if lexicographic is not None and "warning" in lexicographic:
+        result["warnings"].append(lexicographic["warning"])
+    if port_info is not None:
+        # Before the alternatives' no-good cuts are added to the model
+        if request.input.compareExact and port_info["strategy"] != "exact":
+            check_cancelled(cancel)
+            compare_exact_ports(built, port_info)
+        result["portRelaxation"] = port_info
+        if "warning" in port_info:
+            result["warnings"].append(port_info["warning"])
+    solution_count = max(1, request.input.solutionCount or 1)
+    if solution_count > 1 and result["solverFeasible"]:
+        with memory_phase(memory, "alternatives"):
+            result["alternatives"] = find_alternatives(
+                built, result, best_pattern, solution_count - 1
+            )
+    if strategy:
+        result["strategy"] = strategy
+    if lexicographic is not None:
+        result["lexicographic"] = lexicographic
+    return result
+
+
+def with_input(request: SolveRequest, **update):
+    return request.copy(update={"input": request.input.copy(update=update)})
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+def current_rss_mb():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """Lifetime peak RSS of this process (not reset per solve)."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    unit = 2**20 if sys.platform == "darwin" else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+
+
+def child_peak_rss_mb(pid):
+    """
+    Peak RSS so far of a running solver process: VmHWM on Linux, otherwise
+    its current RSS through psutil (so only as good as the sampling rate).
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except (OSError, ValueError):
+        pass
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 2**20
+        except psutil.Error:
+            pass
+    return None
+
+
+@contextmanager
+def memory_phase(memory, name):
+    """Record RSS and (if tracing) peak Python allocations for one phase."""
+    if memory["tracePython"]:
+        tracemalloc.reset_peak()
+    start = time.time()
+    try:
+        yield
+    finally:
+        phase = {"seconds": time.time() - start, "rssMB": current_rss_mb()}
+        if memory["tracePython"]:
+            current, peak = tracemalloc.get_traced_memory()
+            phase["pythonPeakMB"] = peak / 2**20
+            phase["pythonCurrentMB"] = current / 2**20
+        memory["phases"][name] = phase
+
+
+def predict_memory_mb(size, port_mode):
+    """
+    Rough per-solve footprint. PuLP expressions and names take ~700 bytes per
+    nonzero (measured with tracemalloc on the bundled game data), the MPS
+    file and solver copy ~300 more, plus branch-and-bound state that grows
+    with the integer count. Relaxed ports drop 2 integers per zone x item,
+    which only shrinks the branch-and-bound term: the Python build has the
+    same variables, rows and names in both port modes.
+    """
+    integer_vars = size["integerVars"]
+    if port_mode == "relaxed":
+        integer_vars -= 2 * size["zones"] * size["items"]
+    return (1000 * size["nonzeros"] + 4000 * integer_vars) / 2**20
+
+
+def check_memory_budget(request: SolveRequest):
+    """
+    Compare the predicted footprint against the memory ceiling. Over budget
+    requests are switched to relaxed ports without alternatives or exact
+    comparison when that fits ("degrade", explained in memory["warning"]),
+    otherwise rejected with MemoryBudgetExceeded. Degrading saves solver
+    memory only; the model build costs the same. A degraded solve never
+    falls back to exact ports (see repair_ports).
+    """
+    input_data = request.input
+    limit = input_data.memoryLimitMB or SOLVE_MEMORY_LIMIT_MB
+    size = model_size(request)
+    predicted = predict_memory_mb(size, input_data.portMode)
+    memory = {
+        "limitMB": limit,
+        "predictedMB": predicted,
+        "action": "none",
+        "tracePython": bool(input_data.traceMemory),
+        "phases": {},
+        "solverPeakRssMB": None,
+    }
+    if not limit or predicted <= limit:
+        return request, memory
+
+    degraded = predict_memory_mb(size, "relaxed")
+    if SOLVE_MEMORY_ACTION == "degrade" and degraded <= limit:
+        print(
+            f"[SOLVER] Predicted {predicted:.0f}MB exceeds {limit:.0f}MB, "
+            "degrading to relaxed ports."
+        )
+        memory["action"] = "degraded"
+        memory["predictedMB"] = degraded
+        changes = ["relaxed ports"]
+        if (input_data.solutionCount or 1) > 1:
+            changes.append("no alternative plans")
+        if input_data.compareExact:
+            changes.append("no exact-port comparison")
+        memory["warning"] = (
+            f"Predicted solver memory {predicted:.0f}MB exceeds the {limit:.0f}MB "
+            f"limit; solved with {', '.join(changes)} (saves solver memory, "
+            "not model build memory)"
+        )
+        return (
+            with_input(request, portMode="relaxed", solutionCount=1, compareExact=False),
+            memory,
+        )
+    raise MemoryBudgetExceeded(
+        f"Predicted solver memory {predicted:.0f}MB exceeds the {limit:.0f}MB limit "
+        f"({size['zones']} zones, {size['nonzeros']} nonzeros)"
+    )
 
-def run_solver(request: SolveRequest):
-    print("[SOLVER] Initializing MILP model...")
+
+def model_size(request: SolveRequest):
+    """Variable and nonzero counts that build_model() will produce."""
+    input_data = request.input
+    zones = input_data.zones
+    n_zones, n_recipes, n_items = len(zones), len(request.recipes), len(request.items)
+    # Per zone: capacity, activation and balance rows per recipe, balance,
+    # port link and port total rows per item, plus optional area/slot rows
+    recipe_nz = sum(5 + len(r.inputs) for r in request.recipes)
+    nonzeros = sum(
+        recipe_nz
+        + 8 * n_items
+        + (n_recipes if z.areaLimit else 0)
+        + (n_recipes if z.machineSlots else 0)
+        for z in zones
+    )
+    # Global conservation / raw limit rows and target rows
+    nonzeros += 2 * n_zones * (n_items + len(input_data.targets))
+    return {
+        "zones": n_zones,
+        "recipes": n_recipes,
+        "items": n_items,
+        "integerVars": n_zones * (2 * n_recipes + 2 * n_items),
+        "nonzeros": nonzeros,
+    }
+
+
+def load_solve_history():
+    if not os.path.exists(SOLVE_HISTORY_PATH):
+        return []
+    history = []
+    with open(SOLVE_HISTORY_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                history.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return history[-SOLVE_HISTORY_LIMIT:]
+
+
+_history_lock = threading.Lock()
+
+
+def record_solve_history(strategy, status):
+    entry = {
+        "nonzeros": strategy["features"]["nonzeros"],
+        "zones": strategy["features"]["zones"],
+        "portMode": strategy["portMode"],
+        "seconds": strategy["actualSeconds"],
+        "timeLimit": strategy["timeLimit"],
+        "status": status,
+    }
+    try:
+        # Concurrent solves would otherwise rewrite the file from stale reads
+        with _history_lock:
+            history = load_solve_history()
+            history.append(entry)
+            with open(SOLVE_HISTORY_PATH, "w", encoding="utf-8") as f:
+                for h in history[-SOLVE_HISTORY_LIMIT:]:
+                    f.write(json.dumps(h) + "\n")
+    except OSError as e:
+        print(f"[SOLVER] Could not write solve history: {e}")
+
+
+def predict_solve_seconds(nonzeros, port_mode, history):
+    """
+    Fit log(seconds) = a + b * log(nonzeros) over past solves in the same port
+    mode that finished before their time limit. Falls back to a rough default
+    when there are too few distinct sizes to fit.
+    """
+    samples = [
+        (math.log(h["nonzeros"]), math.log(max(h["seconds"], 0.01)))
+        for h in history
+        if h.get("portMode") == port_mode
+        and h["nonzeros"] > 0
+        and h["seconds"] < 0.95 * h["timeLimit"]
+    ]
+    if len({s[0] for s in samples}) < 3:
+        # Measured on the bundled game data: ~1s for 2 zones, ~3s for 4 zones
+        scale = 0.4 if port_mode == "relaxed" else 1.0
+        return scale * 2.5e-7 * nonzeros**2, len(samples)
+    n = len(samples)
+    mx = sum(s[0] for s in samples) / n
+    my = sum(s[1] for s in samples) / n
+    var = sum((s[0] - mx) ** 2 for s in samples)
+    slope = sum((s[0] - mx) * (s[1] - my) for s in samples) / var
+    return math.exp(my + slope * (math.log(nonzeros) - mx)), n
+
+
+def choose_strategy(request: SolveRequest):
+    """
+    Pick time limit, MIP gap, threads and port formulation for one request.
+
+    small  (< 2s predicted):  exact ports, default gap, short limit
+    medium (< 20s predicted): exact ports, 0.5% gap
+    large:                    relaxed ports + repair, 1% gap, all cores
+    """
+    features = model_size(request)
+    history = load_solve_history()
+    predicted, samples = predict_solve_seconds(features["nonzeros"], "exact", history)
+
+    if predicted < 2:
+        tier, port_mode, options = "small", "exact", {}
+        time_limit = min(max(5 * predicted, 5), 15)
+    elif predicted < 20:
+        tier, port_mode, options = "medium", "exact", {"gapRel": 0.005}
+        time_limit = min(max(3 * predicted, 15), 60)
+    else:
+        tier, port_mode = "large", "relaxed"
+        options = {"gapRel": 0.01, "threads": os.cpu_count()}
+        predicted, samples = predict_solve_seconds(
+            features["nonzeros"], "relaxed", history
+        )
+        time_limit = min(max(2 * predicted, 30), 300)
+
+    print(
+        f"[SOLVER] Auto strategy: {tier} ({features['nonzeros']} nonzeros, "
+        f"predicted {predicted:.2f}s from {samples} samples), timeLimit={time_limit:.0f}s"
+    )
+    return {
+        "tier": tier,
+        "portMode": port_mode,
+        "timeLimit": time_limit,
+        "solverOptions": options,
+        "predictedSeconds": predicted,
+        "historySamples": samples,
+        "features": features,
+    }
+
+
+def build_model(request: SolveRequest):
 
     input_data = request.input
     items = request.items
@@ -178,7 +1176,6 @@ def run_solver(request: SolveRequest):
     consolidation_weight = input_data.consolidationWeight or 0.05
     machine_weight = input_data.machineWeight or 0.01
     transfer_penalty_val = input_data.transferPenalty or 0.5
-    time_limit = input_data.timeLimit or 15
 
     recipe_activation_penalty = consolidation_weight * avg_price
     per_machine_penalty = (machine_weight * avg_price) / 10
@@ -243,16 +1240,20 @@ def run_solver(request: SolveRequest):
         }
         for z in zones
     }
+    # In relaxed mode ports are continuous, so the per-zone port totals act as
+    # aggregate flow capacity; repair_ports() assigns integer ports afterwards.
+    relaxed_ports = input_data.portMode == "relaxed"
+    port_cat = "Continuous" if relaxed_ports else "Integer"
     p_in = {
         z.id: {
-            i_id: pulp.LpVariable(f"PortIn_{z.id}_{i_id}", lowBound=0, cat="Integer")
+            i_id: pulp.LpVariable(f"PortIn_{z.id}_{i_id}", lowBound=0, cat=port_cat)
             for i_id in all_item_ids
         }
         for z in zones
     }
     p_out = {
         z.id: {
-            i_id: pulp.LpVariable(f"PortOut_{z.id}_{i_id}", lowBound=0, cat="Integer")
+            i_id: pulp.LpVariable(f"PortOut_{z.id}_{i_id}", lowBound=0, cat=port_cat)
             for i_id in all_item_ids
         }
         for z in zones
@@ -335,20 +1336,20 @@ def run_solver(request: SolveRequest):
             )
 
     # Objective
-    profit_terms = []
+    sales_terms = []
     prices = {i.id: i.price for i in items if i.price > 0}
     for i_id, price in prices.items():
         net = pulp.lpSum([f_out[z.id][i_id] - f_in[z.id][i_id] for z in zones])
         target_rate = next(
             (t.targetRate for t in input_data.targets if t.itemId == i_id), 0
         )
-        profit_terms.append(price * (net - target_rate))
+        sales_terms.append(price * (net - target_rate))
 
     shortfall_penalty = 1e6
-    for t_id, slack_var in slack_target.items():
-        profit_terms.append(-shortfall_penalty * slack_var)
+    shortfall = pulp.lpSum(list(slack_target.values()))
 
     penalty_terms = []
+    transfer_terms = []
     for z in zones:
         for r_id in x[z.id]:
             penalty_terms.append(x[z.id][r_id] * per_machine_penalty)
@@ -357,29 +1358,258 @@ def run_solver(request: SolveRequest):
             penalty_terms.append(p_in[z.id][i_id] * 0.0001 * avg_price)
             penalty_terms.append(p_out[z.id][i_id] * 0.0001 * avg_price)
             if i_id not in raw_resource_ids:
-                profit_terms.append(-transfer_cost_base * f_in[z.id][i_id])
-
-    model += pulp.lpSum(profit_terms) - pulp.lpSum(penalty_terms)
+                transfer_terms.append(f_in[z.id][i_id])
+
+    # Kept apart so the lexicographic mode can optimise them one at a time
+    objective_parts = {
+        "sales": pulp.lpSum(sales_terms),
+        "shortfall": shortfall,
+        "transfers": pulp.lpSum(transfer_terms),
+        "penalty": pulp.lpSum(penalty_terms),
+    }
+    weighted_objective = (
+        objective_parts["sales"]
+        - shortfall_penalty * shortfall
+        - transfer_cost_base * objective_parts["transfers"]
+        - objective_parts["penalty"]
+    )
+    model += weighted_objective
 
-    # Solve using HiGHS
     print(
         f"[SOLVER] Model built with {len(model.constraints)} constraints and {len(model.variables())} variables."
     )
+    return {
+        "model": model,
+        "input": input_data,
+        "zones": zones,
+        "processed_recipes": processed_recipes,
+        "all_item_ids": all_item_ids,
+        "raw_resource_ids": raw_resource_ids,
+        "intermediate_item_ids": intermediate_item_ids,
+        "prices": prices,
+        "x": x,
+        "is_active": is_active,
+        "y": y,
+        "f_in": f_in,
+        "f_out": f_out,
+        "p_in": p_in,
+        "p_out": p_out,
+        "slack_target": slack_target,
+        "relaxed_ports": relaxed_ports,
+        "objective_parts": objective_parts,
+        "weighted_objective": weighted_objective,
+        "avg_price": avg_price,
+        "transfer_cost_base": transfer_cost_base,
+    }
+
+
+# Per-thread state of the solve running in it (cancel event, memory report)
+_solve_context = threading.local()
+
+
+class _SolverPopen(subprocess.Popen):
+    """
+    Popen used by PuLP's HiGHS and CBC interfaces. For a solve started by
+    run_solver() a watcher thread samples the solver process's peak RSS into
+    the memory report every 50ms, and kills the process once the solve's
+    cancel event is set so a superseded solve stops mid-search.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cancel = getattr(_solve_context, "cancel", None)
+        memory = getattr(_solve_context, "memory", None)
+        if cancel is not None or memory is not None:
+            threading.Thread(
+                target=self._watch,
+                args=(cancel or threading.Event(), memory),
+                daemon=True,
+            ).start()
+
+    def _watch(self, cancel, memory):
+        while self.poll() is None:
+            peak = child_peak_rss_mb(self.pid) if memory is not None else None
+            if peak is not None:
+                memory["solverPeakRssMB"] = max(memory["solverPeakRssMB"] or 0, peak)
+            if cancel.wait(0.05):
+                self.kill()
+                return
+
+
+for _solver_api in (pulp.apis.highs_api, pulp.apis.coin_api):
+    _solver_api.subprocess = types.SimpleNamespace(
+        **{**vars(subprocess), "Popen": _SolverPopen}
+    )
+
+
+def solve_model(model, time_limit, options=None):
+    """
+    Solve with HiGHS, falling back to CBC. `options` are extra solver keyword
+    arguments (gapRel, threads) plus randomSeed, which is translated to each
+    solver's own option. Returns an error message on crash, and raises
+    SolveCancelled if the thread's solve was cancelled before or during it.
+    """
+    cancel = getattr(_solve_context, "cancel", None)
+    check_cancelled(cancel)
+    options = dict(options or {})
+    seed = options.pop("randomSeed", None)
+    highs_options = [f"random_seed={seed}"] if seed is not None else []
+    cbc_options = [f"randomSeed {seed}", f"randomCbcSeed {seed}"] if seed is not None else []
     try:
         print(f"[SOLVER] Calling HiGHS solver (timeLimit={time_limit}s)...")
         # PuLP supports HiGHS via the HiGHS_CMD interface
-        model.solve(pulp.HiGHS_CMD(msg=False, timeLimit=time_limit))
+        model.solve(
+            pulp.HiGHS_CMD(
+                msg=False, timeLimit=time_limit, options=highs_options, **options
+            )
+        )
     except Exception as e:
+        check_cancelled(cancel)
         print(f"[SOLVER] HiGHS solve failed, falling back to CBC: {e}")
+        # CBC's MIP start was seen to end the search at the start point when
+        # only the objective changed (lexicographic stages), so it goes cold
+        options.pop("warmStart", None)
         try:
-            model.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+            model.solve(
+                pulp.PULP_CBC_CMD(
+                    msg=False, timeLimit=time_limit, options=cbc_options, **options
+                )
+            )
         except Exception as e2:
+            check_cancelled(cancel)
             print(f"[SOLVER] CRITICAL SOLVER CRASH: {e2}")
-            return {
-                "feasible": False,
-                "solverFeasible": False,
-                "warnings": [f"Solver crashed: {str(e2)}"],
+            return f"Solver crashed: {str(e2)}"
+    check_cancelled(cancel)
+    return None
+
+
+def lexicographic_stages(built):
+    """(name, objective to maximise) per stage, each scaled to O(1) coefficients."""
+    input_data = built["input"]
+    parts = built["objective_parts"]
+    avg_price = built["avg_price"]
+    stages = []
+    if input_data.targets:
+        stages.append(("shortfall", -parts["shortfall"]))
+    if input_data.optimizationMode == "minTransfers":
+        stages.append(("transfers", -parts["transfers"]))
+        stages.append(("profit", parts["sales"] / avg_price))
+    else:
+        # balanced mode trades transfers against income at the user's weight
+        stages.append(
+            (
+                "profit",
+                (parts["sales"] - built["transfer_cost_base"] * parts["transfers"])
+                / avg_price,
+            )
+        )
+    if input_data.tieBreak is not False:
+        stages.append(("tieBreak", -parts["penalty"] / avg_price))
+    return stages
+
+
+# Absolute slack on top of lexTolerance when fixing a stage's optimum: the
+# solvers write solution values at limited precision, so a stage value
+# recomputed from them can sit just past what the next stage can reach
+# (1e-6 was not enough with CBC). On the shortfall stage this may cost up to
+# 1e6 * slack in the weighted objective reported for lexicographic plans.
+LEX_ABS_TOLERANCE = 1e-5
+
+
+def solve_lexicographic(built, time_limit):
+    """
+    Optimise the objective stages in priority order instead of one weighted
+    sum. After each stage its optimum is fixed (within lexTolerance plus
+    LEX_ABS_TOLERANCE) as a constraint, and the next stage is warm-started
+    from the current solution, which stays feasible. If a later stage fails
+    the last good stage's solution and status are kept, with a warning in
+    built["lexicographic"]. The stage constraints are removed and the
+    weighted objective restored afterwards, so the reported objective is
+    comparable with weighted mode and re-solves (see solve_current) start
+    clean.
+    """
+    model = built["model"]
+    tolerance = built["input"].lexTolerance or 0
+    deadline = time.time() + time_limit
+    stages_info = []
+    built["lexicographic"] = {"stages": stages_info}
+    fixed = []
+    error = None
+    last_good = None
+    for k, (name, objective) in enumerate(lexicographic_stages(built)):
+        model.setObjective(objective)
+        options = dict(built["solver_options"])
+        if k > 0:
+            options["warmStart"] = True
+        start = time.time()
+        print(f"[SOLVER] Lexicographic stage {k + 1}: {name}")
+        error = solve_model(model, max(deadline - start, 1), options)
+        status = pulp.LpStatus[model.status]
+        value = pulp.value(objective) or 0
+        stages_info.append(
+            {
+                "name": name,
+                "status": status,
+                "objective": value,
+                "seconds": time.time() - start,
             }
+        )
+        if error or status not in ["Optimal", "Not Solved"]:
+            if last_good is not None:
+                good_name, good_status, values = last_good
+                model.assignVarsVals(values)
+                model.status = good_status
+                error = None
+                built["lexicographic"]["warning"] = (
+                    f"Lexicographic stage {name} ended {status}; "
+                    f"kept the {good_name} stage's plan"
+                )
+            break
+        last_good = (
+            name,
+            model.status,
+            {v.name: v.varValue for v in model.variables()},
+        )
+        slack = LEX_ABS_TOLERANCE + tolerance * abs(value)
+        constraint_name = f"Lex_{name}"
+        model += objective >= value - slack, constraint_name
+        fixed.append(constraint_name)
+
+    for constraint_name in fixed:
+        del model.constraints[constraint_name]
+    model.setObjective(built["weighted_objective"])
+    return error
+
+
+def remaining_seconds(built):
+    """Time left until the request's deadline, at least a second per solve."""
+    return max(built["deadline"] - time.time(), 1)
+
+
+def solve_current(built, time_limit):
+    """
+    Solve the built model in the request's objectiveMode. Every re-solve
+    (port repair, exact comparison, alternatives) goes through here so it
+    optimises the same objective as the best plan.
+    """
+    if built["input"].objectiveMode == "lexicographic":
+        return solve_lexicographic(built, time_limit)
+    return solve_model(built["model"], time_limit, built["solver_options"])
+
+
+def extract_result(built):
+    model = built["model"]
+    input_data = built["input"]
+    zones = built["zones"]
+    processed_recipes = built["processed_recipes"]
+    all_item_ids = built["all_item_ids"]
+    raw_resource_ids = built["raw_resource_ids"]
+    intermediate_item_ids = built["intermediate_item_ids"]
+    prices = built["prices"]
+    x, y = built["x"], built["y"]
+    f_in, f_out = built["f_in"], built["f_out"]
+    p_in, p_out = built["p_in"], built["p_out"]
+    slack_target = built["slack_target"]
 
     status = pulp.LpStatus[model.status]
     solver_feasible = status in ["Optimal", "Not Solved"]
@@ -523,9 +1753,286 @@ def run_solver(request: SolveRequest):
         "unmetTargets": unmet,
         "warnings": [],
         "transferOverhead": 0,
+        "objective": pulp.value(model.objective) if solver_feasible else None,
+    }
+
+
+def allocate_ports(flows, throughput, limit):
+    """
+    Integer ports per item: ceil(flow / throughput), then while over the zone
+    limit drop the port carrying the least flow. Returns (ports, trimmed).
+    """
+    ports = {
+        i_id: math.ceil(rate / throughput - 1e-6)
+        for i_id, rate in flows.items()
+        if rate > 1e-6
+    }
+    excess = sum(ports.values()) - limit
+    if excess <= 0:
+        return ports, False
+
+    # Flow on an item's last port; trimming that port loses at most this much
+    heap = [
+        (rate - (ports[i_id] - 1) * throughput, i_id)
+        for i_id, rate in flows.items()
+        if i_id in ports
+    ]
+    heapq.heapify(heap)
+    while excess > 0 and heap:
+        _, i_id = heapq.heappop(heap)
+        ports[i_id] -= 1
+        excess -= 1
+        if ports[i_id] > 0:
+            heapq.heappush(heap, (throughput, i_id))
+    return ports, True
+
+
+def set_port_category(built, cat):
+    for p in (built["p_in"], built["p_out"]):
+        for row in p.values():
+            for var in row.values():
+                var.cat = cat
+                var.lowBound, var.upBound = 0, None
+
+
+def round_relaxed_ports(built, info):
+    """
+    Round the relaxed plan's ports up, or trim and re-balance them with an
+    LP; sets info["strategy"] to "ceil", "repair" or (failed) "exact".
+    """
+    tolerance = built["input"].portRepairTolerance or 0
+    model = built["model"]
+    zones = built["zones"]
+    x, is_active = built["x"], built["is_active"]
+    p_in, p_out = built["p_in"], built["p_out"]
+    f_in, f_out = built["f_in"], built["f_out"]
+
+    start = time.time()
+    allocation = {}
+    trimmed = False
+    for z in zones:
+        for p, f, limit in (
+            (p_in, f_in, z.outputPorts),
+            (p_out, f_out, z.inputPorts),
+        ):
+            flows = {i_id: pulp.value(var) or 0 for i_id, var in f[z.id].items()}
+            ports, zone_trimmed = allocate_ports(flows, z.portThroughput, limit)
+            trimmed = trimmed or zone_trimmed
+            for i_id, var in p[z.id].items():
+                allocation[var] = ports.get(i_id, 0)
+
+    shortfall_before = sum(pulp.value(v) or 0 for v in built["slack_target"].values())
+    if not trimmed:
+        for var, ports in allocation.items():
+            var.varValue = ports
+    else:
+        info["strategy"] = "repair"
+        fixed = []
+        for var, ports in allocation.items():
+            var.lowBound = var.upBound = ports
+        for grid in (x, is_active):
+            for row in grid.values():
+                for var in row.values():
+                    fixed.append((var, var.lowBound, var.upBound))
+                    var.lowBound = var.upBound = round(pulp.value(var) or 0)
+        error = solve_current(built, remaining_seconds(built))
+        for var, low, up in fixed:
+            var.lowBound, var.upBound = low, up
+        for var in allocation:
+            var.lowBound, var.upBound = 0, None
+        info["repairStatus"] = pulp.LpStatus[model.status]
+        if error or info["repairStatus"] != "Optimal":
+            info["strategy"] = "exact"
+    info["repairSeconds"] = time.time() - start
+    info["repairedObjective"] = pulp.value(model.objective) or 0
+
+    if info["strategy"] == "repair":
+        loss = info["relaxedObjective"] - info["repairedObjective"]
+        shortfall_after = sum(
+            pulp.value(v) or 0 for v in built["slack_target"].values()
+        )
+        if shortfall_after > shortfall_before + 1e-3 or loss > tolerance * max(
+            abs(info["relaxedObjective"]), 1
+        ):
+            info["strategy"] = "exact"
+
+
+def repair_ports(built):
+    """
+    Turn a relaxed-port solution into integer ports per zone x item.
+
+    If the rounded-up allocation fits every zone's port totals the relaxed
+    flows are kept as they are. Otherwise ports are trimmed greedily, then the
+    ports and machine counts are fixed and flows re-balanced with an LP. The
+    repair fails if it loses more than `tolerance` (relative) of the relaxed
+    objective or leaves a target short, and the exact formulation is solved.
+    Both re-solves only get the time left until built["deadline"].
+    """
+    model = built["model"]
+    info = {
+        "strategy": "ceil",
+        "relaxedStatus": pulp.LpStatus[model.status],
+        "relaxedObjective": pulp.value(model.objective) or 0,
+        "relaxedSeconds": built.get("solve_seconds"),
+    }
+    if info["relaxedStatus"] == "Infeasible":
+        # Relaxation infeasible: the exact model is too
+        info["strategy"] = "infeasible"
+        return info
+    if info["relaxedStatus"] in ["Optimal", "Not Solved"]:
+        round_relaxed_ports(built, info)
+    else:
+        # No relaxed plan to round (solver gave up): go straight to exact
+        info["strategy"] = "exact"
+        info["repairedObjective"] = info["relaxedObjective"]
+
+    if info["strategy"] == "exact" and built["memory_degraded"]:
+        # Exact ports are the model the memory ceiling ruled out
+        if info.get("repairStatus") != "Optimal":
+            raise MemoryBudgetExceeded(
+                "Port repair failed and the exact port formulation exceeds "
+                "the memory limit"
+            )
+        info["strategy"] = "repair"
+        info["warning"] = (
+            "Port repair lost more than portRepairTolerance; the exact port "
+            "fallback was skipped to stay within the memory limit"
+        )
+
+    if info["strategy"] == "exact":
+        print("[SOLVER] Port repair failed, falling back to exact port formulation...")
+        set_port_category(built, "Integer")
+        built["relaxed_ports"] = False
+        start = time.time()
+        solve_current(built, remaining_seconds(built))
+        info["exactSeconds"] = time.time() - start
+        info["exactObjective"] = pulp.value(model.objective) or 0
+
+    # Upper bound on what exact mode could gain over the returned plan
+    final_objective = info.get("exactObjective", info["repairedObjective"])
+    info["objectiveGapBound"] = info["relaxedObjective"] - final_objective
+    print(
+        f"[SOLVER] Relaxed ports: strategy={info['strategy']}, "
+        f"gap bound={info['objectiveGapBound']:.4f}"
+    )
+    return info
+
+
+def compare_exact_ports(built, info):
+    """
+    Re-solve with integer ports, within what is left of the deadline, to
+    measure the relaxed plan's real loss. The ports are made continuous again
+    afterwards; the model's variable values are the exact solve's from then
+    on.
+    """
+    model = built["model"]
+    set_port_category(built, "Integer")
+    start = time.time()
+    error = solve_current(built, remaining_seconds(built))
+    set_port_category(built, "Continuous")
+    if error is None:
+        info["exactSeconds"] = time.time() - start
+        info["exactObjective"] = pulp.value(model.objective) or 0
+        info["objectiveDiffVsExact"] = info["exactObjective"] - info["repairedObjective"]
+
+
+def active_recipe_pattern(built):
+    """Set of (zoneId, recipeId) pairs with at least one machine built."""
+    return {
+        (z_id, r_id)
+        for z_id, row in built["x"].items()
+        for r_id, var in row.items()
+        if (pulp.value(var) or 0) > 0.5
     }
 
 
+def solution_metrics(result):
+    transfers = [f for f in result["itemFlows"] if f["fromZoneId"] is not None]
+    return {
+        "totalIncome": result["totalIncome"],
+        "totalMachines": sum(zr["totalMachines"] for zr in result["zoneResults"]),
+        "transferCount": len(transfers),
+        "transferRate": sum(f["rate"] for f in transfers),
+    }
+
+
+def find_alternatives(built, best_result, best_pattern, count):
+    """
+    Collect up to `count` further plans that differ from every previous plan
+    in which recipes are active per zone. Each round adds a no-good cut on the
+    is_active binaries to the same model and re-solves it. `best_pattern` is
+    active_recipe_pattern() of the best plan, taken when it was extracted.
+
+    The rounds use whatever is left until built["deadline"] and stop, with a
+    warning on the best result, once less than a second remains.
+    """
+    model = built["model"]
+    x, is_active = built["x"], built["is_active"]
+
+    # Tie is_active to x >= 1 so a cut cannot be satisfied by switching on a
+    # recipe with zero machines. This is implied at the optimum already.
+    for z_id, row in x.items():
+        for r_id, var in row.items():
+            model += var >= is_active[z_id][r_id], f"PoolLink_{z_id}_{r_id}"
+
+    best_objective = best_result["objective"]
+    best_metrics = solution_metrics(best_result)
+    pattern = best_pattern
+    alternatives = []
+    for rank in range(1, count + 1):
+        check_cancelled(built.get("cancel"))
+        time_limit = built["deadline"] - time.time()
+        if time_limit < 1:
+            best_result["warnings"].append(
+                f"Time limit reached after {rank - 1} of {count} alternative plans"
+            )
+            break
+        model += (
+            pulp.lpSum(
+                [1 - is_active[z_id][r_id] for z_id, r_id in pattern]
+                + [
+                    is_active[z_id][r_id]
+                    for z_id, row in is_active.items()
+                    for r_id in row
+                    if (z_id, r_id) not in pattern
+                ]
+            )
+            >= 1,
+            f"NoGood_{rank}",
+        )
+        print(f"[SOLVER] Searching alternative plan {rank}/{count}...")
+        if solve_current(built, time_limit):
+            break
+        if pulp.LpStatus[model.status] not in ["Optimal", "Not Solved"]:
+            print("[SOLVER] No further distinct plans.")
+            break
+        lexicographic = built.get("lexicographic")
+        port_info = None
+        if built["relaxed_ports"]:
+            port_info = repair_ports(built)
+        result = extract_result(built)
+        if port_info is not None:
+            result["portRelaxation"] = port_info
+        if lexicographic is not None:
+            result["lexicographic"] = lexicographic
+            if "warning" in lexicographic:
+                result["warnings"].append(lexicographic["warning"])
+        metrics = solution_metrics(result)
+        objective = pulp.value(model.objective) or 0
+        alternatives.append(
+            {
+                "rank": rank,
+                "objective": objective,
+                "objectiveGap": best_objective - objective,
+                "incomeDelta": metrics["totalIncome"] - best_metrics["totalIncome"],
+                **metrics,
+                **result,
+            }
+        )
+        pattern = active_recipe_pattern(built)
+    return alternatives
+
+
 if __name__ == "__main__":
     import uvicorn
 
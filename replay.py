@@ -0,0 +1,156 @@
+"""
+Replay /solve requests captured with SOLVE_CAPTURE_PATH against the current
+solver code, with a fixed solver seed and thread count.
+
+    python replay.py captures.jsonl [captures.jsonl.1 ...] [--seed 0] [--threads 1]
+
+Reports per-request solve time and objective drift against the captured run.
+Requests that raise are reported as errors and the replay carries on.
+Auto-strategy requests reuse the settings captured with them and never
+write to the solve history.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+
+from main import SolveRequest, model_fingerprint, run_solver
+
+
+def load_captures(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    yield path, line_no, json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"[REPLAY] Skipping malformed line {path}:{line_no}")
+
+
+def pin_strategy(request, record, options):
+    """
+    Replay an auto-strategy request with the settings it was captured with,
+    so history changes since then do not alter what is being compared.
+    """
+    pinned = record.get("strategy")
+    if request.input.strategy != "auto" or not pinned:
+        return request, options
+    request.input.strategy = None
+    request.input.timeLimit = pinned["timeLimit"]
+    request.input.portMode = pinned["portMode"]
+    return request, {**pinned["solverOptions"], **options}
+
+
+def replay_one(record, seed, threads, time_limit, verbose):
+    request = SolveRequest(**record["request"])
+    fingerprint_changed = model_fingerprint(request) != record.get("fingerprint")
+    options = {"randomSeed": seed, "threads": threads}
+    request, options = pin_strategy(request, record, options)
+    if time_limit is not None:
+        request.input.timeLimit = time_limit
+
+    error = None
+    start = time.time()
+    output = (
+        contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    )
+    try:
+        with output:
+            result = run_solver(request, options, record_history=False)
+    except Exception as e:
+        result, error = {}, f"{type(e).__name__}: {e}"
+    duration = time.time() - start
+
+    old_objective = record.get("objective")
+    new_objective = result.get("objective")
+    drift = None
+    if old_objective is not None and new_objective is not None:
+        drift = new_objective - old_objective
+    if error:
+        replay_status = "Error"
+    else:
+        replay_status = "Optimal" if result.get("solverFeasible") else "Infeasible"
+    return {
+        "fingerprint": record.get("fingerprint"),
+        "fingerprintChanged": fingerprint_changed,
+        "capturedSeconds": record.get("durationSeconds"),
+        "replaySeconds": duration,
+        "capturedStatus": record.get("status"),
+        "replayStatus": replay_status,
+        "error": error,
+        "capturedObjective": old_objective,
+        "replayObjective": new_objective,
+        "objectiveDrift": drift,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("captures", nargs="+", help="capture JSONL file(s)")
+    parser.add_argument("--seed", type=int, default=0, help="solver random seed")
+    parser.add_argument("--threads", type=int, default=1, help="solver threads")
+    parser.add_argument(
+        "--time-limit", type=float, default=None, help="override captured timeLimit"
+    )
+    parser.add_argument("--fingerprint", help="only replay this model fingerprint")
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0,
+        help="only replay requests that originally took at least this long",
+    )
+    parser.add_argument("--output", help="write the full report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show solver output")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for path, line_no, record in load_captures(args.captures):
+        if "request" not in record:
+            continue
+        if args.fingerprint and record.get("fingerprint") != args.fingerprint:
+            continue
+        if (record.get("durationSeconds") or 0) < args.min_seconds:
+            continue
+        row = replay_one(
+            record, args.seed, args.threads, args.time_limit, args.verbose
+        )
+        row["source"] = f"{path}:{line_no}"
+        rows.append(row)
+
+        drift = row["objectiveDrift"]
+        print(
+            f"{row['source']:<32} {row['fingerprint'] or '-':<16} "
+            f"captured {row['capturedSeconds'] or 0:7.2f}s  "
+            f"replay {row['replaySeconds']:7.2f}s  "
+            f"drift {'n/a' if drift is None else f'{drift:+.4f}':>12}  "
+            f"{row['replayStatus']}{' (model changed)' if row['fingerprintChanged'] else ''}"
+        )
+        if row["error"]:
+            print(f"    {row['error']}")
+
+    if not rows:
+        print("[REPLAY] No matching captured requests.")
+        return 1
+
+    total_captured = sum(r["capturedSeconds"] or 0 for r in rows)
+    total_replay = sum(r["replaySeconds"] for r in rows)
+    drifted = [
+        r for r in rows if r["objectiveDrift"] is not None and abs(r["objectiveDrift"]) > 1e-6
+    ]
+    errors = [r for r in rows if r["replayStatus"] == "Error"]
+    print(
+        f"[REPLAY] {len(rows)} requests: captured {total_captured:.2f}s, "
+        f"replay {total_replay:.2f}s, {len(drifted)} with objective drift, "
+        f"{len(errors)} errors."
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,9 @@ import { ZoneNavigator } from './calculator/ZoneNavigator';
 import { ZoneReportView } from './calculator/ZoneReportView';
 import { ErrorBoundary } from './ErrorBoundary';
 
+// Identifies this tab to the Python solver so a newer request supersedes older ones
+const SOLVE_SESSION_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
  interface CalculatorProps {
 
    // Config State
@@ -126,11 +129,23 @@ import { ErrorBoundary } from './ErrorBoundary';
    const [pythonSolverAvailable, setPythonSolverAvailable] = useState<boolean | null>(null);
    const [elapsedTime, setElapsedTime] = useState(0);
  
-   // Check Python solver availability
+   // Check Python solver availability; 503 while it is still warming up
    useEffect(() => {
-     fetch('http://localhost:8000/docs', { mode: 'no-cors' })
-       .then(() => setPythonSolverAvailable(true))
-       .catch(() => setPythonSolverAvailable(false));
+     let retry: ReturnType<typeof setTimeout> | undefined;
+     const check = () => {
+       fetch('http://localhost:8000/health/ready')
+         .then(async res => {
+           const startup = await res.json().catch(() => null);
+           if (res.status === 503 && startup && !startup.ready) {
+             retry = setTimeout(check, 1000);
+             return;
+           }
+           setPythonSolverAvailable(res.ok);
+         })
+         .catch(() => setPythonSolverAvailable(false));
+     };
+     check();
+     return () => clearTimeout(retry);
    }, []);
 
    // Timer for calculation
@@ -211,7 +226,7 @@ import { ErrorBoundary } from './ErrorBoundary';
 
         const response = await fetch('http://localhost:8000/solve', {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: { 'Content-Type': 'application/json', 'X-Solve-Session': SOLVE_SESSION_ID },
           body: JSON.stringify({
             input,
             items,
@@ -221,6 +236,12 @@ import { ErrorBoundary } from './ErrorBoundary';
         });
 
         console.log('Python solver response status:', response.status);
+
+        if (response.status === 409) {
+          // Superseded by a newer request from this tab; that one updates the view
+          console.log('Python solver request superseded by a newer one.');
+          return;
+        }
         
         if (onCalculationProgress) {
           onCalculationProgress({
@@ -90,9 +90,29 @@ export interface CalculatorInput {
   consolidationWeight?: number; // Penalty for activating a recipe in a zone (0-1)
   machineWeight?: number; // Penalty per machine in Stage A (0-1)
   timeLimit?: number; // Solver time limit in seconds
+  solutionCount?: number; // Python solver: return up to N distinct plans (best + alternatives) within one timeLimit
+  portMode?: 'exact' | 'relaxed'; // Python solver: 'relaxed' solves with continuous ports, then repairs
+  portRepairTolerance?: number; // Max relative objective loss of the port repair before exact fallback
+  compareExact?: boolean; // Also solve exact ports and report the objective difference
+  strategy?: 'auto'; // Python solver: pick time limit, gap and port mode from model size + history
+  memoryLimitMB?: number; // Python solver: per-solve memory ceiling (overrides SOLVE_MEMORY_LIMIT_MB)
+  traceMemory?: boolean; // Python solver: report Python allocations per phase (slower)
+  objectiveMode?: 'weighted' | 'lexicographic'; // Python solver: one weighted objective or staged priorities
+  tieBreak?: boolean; // Lexicographic: run the final machine/recipe/port tie-break stage
+  lexTolerance?: number; // Lexicographic: relative slack (plus 1e-5 absolute) when fixing a stage's optimum
 }
 
 
+export interface AlternativePlan extends CalculatorResult {
+  rank: number;
+  objective: number;
+  objectiveGap: number;        // Best objective minus this plan's objective
+  incomeDelta: number;         // This plan's income minus the best plan's income
+  totalMachines: number;
+  transferCount: number;       // Number of inter-zone item flows
+  transferRate: number;        // Total inter-zone flow (items/min)
+}
+
 export interface ZoneResult {
   zone: Zone;
   assignments: ZoneAssignment[];
@@ -126,6 +146,59 @@ export interface CalculatorResult {
   theoreticalMaxIncome?: number;  // Income if zones were ignored
   transferOverhead: number;       // Extra port usage due to inter-zone transfers
 
+  // Python solver: distinct alternative plans, ranked by objective
+  alternatives?: AlternativePlan[];
+  // Python solver, portMode 'relaxed': how integer ports were recovered
+  portRelaxation?: {
+    strategy: 'ceil' | 'repair' | 'exact' | 'infeasible';
+    relaxedObjective: number;
+    repairedObjective?: number;
+    exactObjective?: number;
+    objectiveGapBound?: number;     // Relaxed objective minus returned objective
+    objectiveDiffVsExact?: number;  // With compareExact: exact minus returned objective
+    relaxedSeconds?: number;
+    repairSeconds?: number;
+    exactSeconds?: number;
+    repairStatus?: string;          // Status of the re-balancing LP, when ports were trimmed
+    warning?: string;               // Degraded request: repair kept instead of the exact fallback
+  };
+
+  // Python solver, strategy 'auto': chosen settings and predicted vs actual solve time
+  strategy?: {
+    tier: 'small' | 'medium' | 'large';
+    portMode: 'exact' | 'relaxed';
+    timeLimit: number;
+    solverOptions: { gapRel?: number; threads?: number };
+    predictedSeconds: number;
+    actualSeconds?: number;      // Whole solve phase: first solve plus port repair / exact fallback
+    firstSolveSeconds?: number;
+    historySamples: number;
+    features: { zones: number; recipes: number; items: number; integerVars: number; nonzeros: number };
+  };
+
+  // Python solver: per-phase memory readings (build / solve / extract / alternatives)
+  diagnostics?: {
+    memory: {
+      limitMB: number | null;
+      predictedMB: number;
+      action: 'none' | 'degraded';
+      warning?: string; // what a degraded solve gave up (also in warnings)
+      tracePython: boolean;
+      phases: Record<string, { seconds: number; rssMB: number | null; pythonPeakMB?: number; pythonCurrentMB?: number }>;
+      maxPhaseEndRssMB: number | null; // largest end-of-phase reading, not a sampled peak
+      processPeakRssMB: number | null; // server process lifetime peak
+      solverPeakRssMB: number | null; // peak of this solve's solver subprocesses, sampled every 50ms
+    };
+  };
+
+  // Python solver, objectiveMode 'lexicographic': per-stage status and timing
+  lexicographic?: {
+    stages: { name: 'shortfall' | 'transfers' | 'profit' | 'tieBreak'; status: string; objective: number; seconds: number }[];
+    warning?: string; // a later stage failed and an earlier stage's plan was kept
+  };
+  // Python solver: requests from this session dropped since its last delivered solve
+  session?: { id: string; coalesced: number };
+
   // Debugging & Flow
   telemetry?: OptimizerTelemetry;
 }
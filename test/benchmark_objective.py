@@ -0,0 +1,114 @@
+"""
+Benchmark: single weighted objective vs lexicographic stages.
+
+Builds multi-zone scenarios from src/data/gameData.json and solves each one
+with objectiveMode="weighted" and objectiveMode="lexicographic", reporting
+solve time, solver status, income, target shortfall and the weighted
+objective value (lexicographic results are scored with the same weighted
+objective, so the two columns are directly comparable).
+
+    python test/benchmark_objective.py [--zones 2 4 6] [--time-limit 30]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from main import GAMEDATA_PATH, SolveRequest, run_solver  # noqa: E402
+
+
+def build_scenario(data, zone_count, mode, time_limit, objective_mode):
+    sellable = sorted(
+        (i for i in data["items"] if i["price"] > 0),
+        key=lambda i: i["price"],
+        reverse=True,
+    )
+    raws = [i for i in data["items"] if i["isRawResource"]]
+    zones = [
+        {
+            "id": f"bench_{k}",
+            "name": f"Bench {k}",
+            "outputPorts": 4 + k % 3,
+            "inputPorts": 4 + k % 3,
+            "portThroughput": 30,
+            "areaLimit": 600 + 150 * (k % 4),
+        }
+        for k in range(zone_count)
+    ]
+    return SolveRequest(
+        input={
+            "targets": [{"itemId": i["id"], "targetRate": 2} for i in sellable[:2]],
+            "resourceConstraints": [
+                {"itemId": r["id"], "maxRate": r.get("baseProductionRate") or 100}
+                for r in raws
+            ],
+            "zones": zones,
+            "optimizationMode": mode,
+            "timeLimit": time_limit,
+            "objectiveMode": objective_mode,
+        },
+        items=data["items"],
+        recipes=data["recipes"],
+        machines=data["machines"],
+    )
+
+
+def run_case(request):
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run_solver(request, {"randomSeed": 0, "threads": 1})
+    return {
+        "seconds": time.time() - start,
+        "feasible": result.get("feasible"),
+        "income": result.get("totalIncome") or 0,
+        "shortfall": sum(u["shortfall"] for u in result.get("unmetTargets", [])),
+        "objective": result.get("objective"),
+        "stages": [
+            (s["name"], s["seconds"])
+            for s in result.get("lexicographic", {}).get("stages", [])
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--zones", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument(
+        "--modes", nargs="+", default=["maxIncome", "balanced", "minTransfers"]
+    )
+    parser.add_argument("--time-limit", type=float, default=30)
+    args = parser.parse_args()
+
+    with open(GAMEDATA_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    print(
+        f"{'zones':>5} {'mode':<13} {'objectiveMode':<14} {'time':>8} "
+        f"{'income':>10} {'shortfall':>9} {'objective':>12}  stages"
+    )
+    for zone_count in args.zones:
+        for mode in args.modes:
+            for objective_mode in ("weighted", "lexicographic"):
+                request = build_scenario(
+                    data, zone_count, mode, args.time_limit, objective_mode
+                )
+                r = run_case(request)
+                stages = " ".join(f"{name}={sec:.2f}s" for name, sec in r["stages"])
+                objective = "n/a" if r["objective"] is None else f"{r['objective']:.3f}"
+                print(
+                    f"{zone_count:>5} {mode:<13} {objective_mode:<14} "
+                    f"{r['seconds']:>7.2f}s {r['income']:>10.2f} "
+                    f"{r['shortfall']:>9.3f} {objective:>12}  {stages}"
+                )
+
+
+if __name__ == "__main__":
+    main()